@@ -1,9 +1,14 @@
-from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters, CallbackQueryHandler
+from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters, CallbackQueryHandler, InlineQueryHandler
 import os
 from dotenv import load_dotenv
 from .search import search_messages
+from .facets import FACET_NAMES
+from .cache import SearchCache
+from .database import get_database
+from .suggest import SuggestionIndex, log_search
 import asyncio
+import logging
 import nest_asyncio
 
 # Apply nest_asyncio to handle nested event loops
@@ -12,6 +17,18 @@ nest_asyncio.apply()
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Inline queries arrive on every keystroke, so they are answered from a shared cache
+INLINE_DEBOUNCE = 0.3  # Seconds to wait for the user to stop typing on a cache miss
+INLINE_LATENCY_BUDGET = 1.0  # Seconds before answering with whatever the cache has
+search_cache = SearchCache(ttl=60, limit=20)
+latest_inline_query = {}  # User id -> id of their most recent inline query
+
+suggestion_index = SuggestionIndex()
+background_tasks = set()  # Strong references so pending fire-and-forget tasks are not collected
+SUGGESTION_REFRESH_INTERVAL = 300  # Seconds between incremental suggestion index rebuilds
+
 # Bot command handlers
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /start is issued."""
@@ -33,23 +50,52 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /help is issued."""
     await update.message.reply_text(
         'Send me any keyword to search through messages.\n'
-        'I will return the top 5 most viewed messages containing your keyword.'
+        'I will return the top 5 most viewed messages containing your keyword.\n\n'
+        'Filter by resource type with /video, /audio, /doc, /link or /group followed by a keyword.'
     )
 
 async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Search messages based on user input."""
-    keyword = update.message.text
-    
+    await reply_search_results(update.message, update.message.text)
+
+async def facet_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /video, /audio, /doc, /link and /group keyword searches."""
+    command = update.message.text.split()[0].lstrip('/').split('@')[0].lower()
+    keyword = ' '.join(context.args)
+    if not keyword:
+        await update.message.reply_text(f"Usage: /{command} keyword")
+        return
+    await reply_search_results(update.message, keyword, FACET_NAMES[command])
+
+async def reply_search_results(message, keyword: str, facets: int = 0):
+    """Run a search and reply to the message with the formatted results."""
     # Send typing action while processing
-    await update.message.chat.send_action('typing')
+    await message.chat.send_action('typing')
     
     try:
         # Get search results
-        results = await search_messages(keyword)
+        results = await search_messages(keyword, facets=facets)
+        # Logged in the background so the reply never waits on a commit to the primary
+        task = asyncio.create_task(log_search(get_database().WriteSession, keyword, len(results)))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
         
         if not results:
-            await update.message.reply_text(
+            # Offer suggestions from memory so retries are not blind guesses
+            suggestions = [
+                s for s in suggestion_index.suggest(keyword)
+                if len(f"suggest:{s}".encode()) <= 64  # Telegram's callback_data limit
+            ]
+            reply_markup = None
+            if suggestions:
+                reply_markup = InlineKeyboardMarkup([
+                    [InlineKeyboardButton(s, callback_data=f"suggest:{s}")]
+                    for s in suggestions
+                ])
+            await message.reply_text(
                 f"No messages found containing '{keyword}'"
+                + ("\n\nDid you mean:" if suggestions else ""),
+                reply_markup=reply_markup
             )
             return
         
@@ -61,17 +107,68 @@ async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"{i}. Channel: @{result['channel_name']}\n"
                 f"👁 Views: {result['views']:,}\n"
                 f"📅 Date: {result['date']}\n"
+            )
+            if result['file_name']:
+                response += f"📎 File: {result['file_name']}\n"
+            response += (
                 f"💬 Message: {result['message_text']}\n\n"
                 f"{'─' * 30}\n\n"
             )
         
-        await update.message.reply_text(response)
+        await message.reply_text(response)
         
     except Exception as e:
-        await update.message.reply_text(
+        await message.reply_text(
             f"Sorry, an error occurred while searching: {str(e)}"
         )
 
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer @bot keyword inline queries."""
+    query = update.inline_query
+    keyword = query.query.strip()
+    if not keyword:
+        await query.answer([], cache_time=int(search_cache.ttl))
+        return
+    
+    user_id = query.from_user.id
+    latest_inline_query[user_id] = query.id
+    
+    try:
+        cached = search_cache.lookup(keyword)
+        if cached is None:
+            # Let fast typing settle; a newer keystroke supersedes this query
+            await asyncio.sleep(INLINE_DEBOUNCE)
+            if latest_inline_query.get(user_id) != query.id:
+                return
+            cached = await search_cache.search(keyword, timeout=INLINE_LATENCY_BUDGET - INLINE_DEBOUNCE)
+    except Exception as e:
+        logger.error(f"Inline search failed for '{keyword}': {e}")
+        cached = (0, [], False)
+    
+    if latest_inline_query.get(user_id) == query.id:
+        del latest_inline_query[user_id]
+    
+    age, results, exact = cached
+    articles = []
+    for i, result in enumerate(results):
+        link = None
+        if result['channel_username']:
+            link = f"https://t.me/{result['channel_username']}/{result['message_id']}"
+        articles.append(InlineQueryResultArticle(
+            id=str(i),
+            title=f"@{result['channel_name']} · 👁 {result['views']:,}",
+            description=result['message_text'][:100],
+            url=link,
+            input_message_content=InputTextMessageContent(
+                f"{result['message_text']}\n\n{link or '@' + str(result['channel_name'])}"
+            )
+        ))
+    
+    # Let Telegram reuse exact answers for as long as they stay fresh in our cache;
+    # fallbacks must not outlive the real results that are still on their way
+    cache_time = max(int(search_cache.ttl - age), 0) if exact else 0
+    await query.answer(articles, cache_time=cache_time)
+
 async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button presses."""
     text = update.message.text
@@ -154,7 +251,10 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()  # Answer the callback query
     
-    if query.data == "recharge":
+    if query.data.startswith("suggest:"):
+        await reply_search_results(query.message, query.data.split(":", 1)[1])
+    
+    elif query.data == "recharge":
         # Send the QR code image from the correct path
         with open('./img/qrcode.jpg', 'rb') as photo:
             await context.bot.send_photo(
@@ -163,6 +263,13 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 caption="扫码充值"
             )
 
+async def refresh_suggestions(context: ContextTypes.DEFAULT_TYPE):
+    """Fold new searches, channels and messages into the suggestion index."""
+    try:
+        await suggestion_index.refresh(await get_database().read_session())
+    except Exception as e:
+        logger.error(f"Failed to refresh suggestions: {e}")
+
 async def privacy_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send privacy policy when the command /privacy is issued."""
     await update.message.reply_text(
@@ -206,10 +313,11 @@ def run_bot():
     application.add_handler(CommandHandler("pc", pc_command))
     application.add_handler(CommandHandler("ad", ad_command))
     application.add_handler(CommandHandler("more", more_command))
+    application.add_handler(CommandHandler(list(FACET_NAMES), facet_search))
     
-    # Add handler for button presses
+    # Add handler for button presses; other text falls through to search
     application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND, 
+        filters.Text(["🔥 热门", "🔍 热搜", "👤 我的"]),
         handle_button
     ))
     
@@ -218,6 +326,12 @@ def run_bot():
 
     # Add this line
     application.add_handler(CallbackQueryHandler(button_callback))
+    
+    # Non-blocking so a debounced inline query does not hold up newer ones
+    application.add_handler(InlineQueryHandler(inline_search, block=False))
+
+    # Build the suggestion index in the background, then keep it up to date
+    application.job_queue.run_repeating(refresh_suggestions, interval=SUGGESTION_REFRESH_INTERVAL, first=0)
 
     # Start the bot
     print("Starting bot...")
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from .search import search_messages
+
+class SearchCache:
+    """
+    In-memory LRU cache of search results for latency-sensitive callers like inline queries.
+    A keyword that extends a cached keyword is answered by filtering the cached results,
+    which is exact when the cached search returned every match (fewer than `limit` rows).
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 5000, limit: int = 20):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.limit = limit
+        self.entries: OrderedDict = OrderedDict()  # (keyword, facets) -> (fetched_at, results)
+        self.pending: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    def _get(self, key: Tuple[str, int]) -> Optional[Tuple[float, List[Dict]]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: Tuple[str, int], results: List[Dict], fetched_at: Optional[float] = None):
+        self.entries[key] = (fetched_at or time.monotonic(), results)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def _matches(result: Dict, keyword: str) -> bool:
+        keyword = keyword.lower()
+        return (
+            keyword in (result['full_text'] or '').lower()
+            or keyword in (result['file_name'] or '').lower()
+        )
+
+    def lookup(self, keyword: str, facets: int = 0, exact_only: bool = True) -> Optional[Tuple[float, List[Dict], bool]]:
+        """
+        Answer from the cache without touching the database
+        :param exact_only: Only use prefix entries that hold every match, so the answer is exact
+        :return: (age in seconds, results, whether the answer is exact), or None on a miss
+        """
+        entry = self._get((keyword, facets))
+        if entry is not None:
+            return time.monotonic() - entry[0], entry[1], True
+
+        # Longest cached prefix first, since it has the fewest candidates to filter
+        for end in range(len(keyword) - 1, 0, -1):
+            entry = self._get((keyword[:end], facets))
+            if entry is None:
+                continue
+            fetched_at, results = entry
+            if exact_only and len(results) >= self.limit:
+                continue
+            filtered = [r for r in results if self._matches(r, keyword)]
+            exact = len(results) < self.limit
+            if exact:
+                # Keep the prefix entry's age so freshness is not overstated
+                self._put((keyword, facets), filtered, fetched_at)
+            return time.monotonic() - fetched_at, filtered, exact
+
+        return None
+
+    async def search(self, keyword: str, facets: int = 0, timeout: Optional[float] = None) -> Tuple[float, List[Dict], bool]:
+        """
+        Search through the cache, falling back to the database
+        :param timeout: Seconds to wait for the database before settling for a partial
+                        prefix answer from the cache
+        :return: (age in seconds, results, whether the answer is exact)
+        """
+        cached = self.lookup(keyword, facets)
+        if cached is not None:
+            return cached
+
+        key = (keyword, facets)
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            # Retrieve errors of fetches nobody is waiting on any more
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.pending[key] = task
+
+        try:
+            # Shielded so a slow query still lands in the cache for the next keystroke
+            results = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            fallback = self.lookup(keyword, facets, exact_only=False)
+            if fallback is None:
+                return 0, [], False
+            age, results, _ = fallback
+            return age, results, False
+        return 0, results, True
+
+    async def _fetch(self, key: Tuple[str, int]) -> List[Dict]:
+        keyword, facets = key
+        try:
+            results = await search_messages(keyword, limit=self.limit, facets=facets)
+            self._put(key, results)
+            return results
+        finally:
+            del self.pending[key]
@@ -1,8 +1,15 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, BigInteger
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, BigInteger, Float, Index, text, event, bindparam
 from datetime import datetime, UTC
 from sqlalchemy.types import TypeDecorator
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
 
 class TZDateTime(TypeDecorator):
     impl = DateTime(timezone=True)
@@ -42,24 +49,291 @@ class Message(Base):
     text = Column(Text)
     views = Column(Integer)
     forwards = Column(Integer)
+    media_type = Column(String(16))  # video, audio, photo or document
+    file_name = Column(String(255))
+    file_size = Column(BigInteger)
+    links = Column(Text)  # Newline-separated t.me links
+    facets = Column(Integer, default=0)  # Bitmask of teso.facets FACET_* flags
     created_at = Column(TZDateTime, default=lambda: datetime.now(UTC))
     updated_at = Column(TZDateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
     
     channel = relationship("Channel", back_populates="messages")
 
-async def init_db(database_url: str):
-    """Initialize database connection"""
-    # Convert the regular PostgreSQL URL to AsyncPG URL
-    async_url = database_url.replace('postgresql://', 'postgresql+asyncpg://')
-    
-    # Create async engine
-    engine = create_async_engine(
-        async_url,
-        echo=True,  # Set to False in production
+    __table_args__ = (
+        # Facet filters select a few exact facets values, then order by views
+        Index('ix_messages_facets_views', 'facets', 'views'),
     )
 
-    # Create all tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+class ChannelSchedule(Base):
+    __tablename__ = 'channel_schedules'
+
+    id = Column(Integer, primary_key=True)
+    target = Column(String(255), unique=True)  # Channel username or link as listed in channels.py
+    next_fetch_at = Column(TZDateTime, index=True)
+    last_fetched_at = Column(TZDateTime)
+    post_rate = Column(Float)  # Estimated messages per hour
+    failure_count = Column(Integer, default=0)
+    lease_owner = Column(String(255))  # Worker currently scraping this channel
+    lease_expires_at = Column(TZDateTime, index=True)
+
+class ChannelRegistry(Base):
+    __tablename__ = 'channel_registry'
+
+    id = Column(Integer, primary_key=True)
+    target = Column(String(255), unique=True)  # Normalized t.me link
+    kind = Column(String(16))  # public, invite or invalid
+    status = Column(String(16), index=True)  # pending, resolved, skipped or failed
+    peer_id = Column(BigInteger)
+    access_hash = Column(BigInteger)
+    username = Column(String(255))
+    title = Column(String(255))
+    error = Column(Text)
+    resolved_at = Column(TZDateTime)
+
+class SearchLog(Base):
+    __tablename__ = 'search_logs'
+
+    id = Column(Integer, primary_key=True)
+    keyword = Column(String(255))
+    result_count = Column(Integer)
+    created_at = Column(TZDateTime, default=lambda: datetime.now(UTC))
+
+def to_async_url(database_url: str) -> str:
+    """Convert the regular PostgreSQL or SQLite URL to its async driver URL"""
+    return (
+        database_url
+        .replace('postgresql://', 'postgresql+asyncpg://')
+        .replace('sqlite://', 'sqlite+aiosqlite://')
+    )
+
+def is_sqlite(database_url: str) -> bool:
+    return database_url.startswith('sqlite')
+
+# External-content FTS5 index over messages.text and file_name, kept in sync by triggers.
+# The trigram tokenizer matches any substring of 3+ characters, which suits CJK text
+# that has no word boundaries.
+SQLITE_FTS_DDL = {
+    'messages_fts': """
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            text, file_name, content='messages', content_rowid='id', tokenize='trigram'
+        )
+    """,
+    'messages_fts_insert': """
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, text, file_name) VALUES (new.id, new.text, new.file_name);
+        END
+    """,
+    'messages_fts_delete': """
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, text, file_name)
+            VALUES ('delete', old.id, old.text, old.file_name);
+        END
+    """,
+    'messages_fts_update': """
+        CREATE TRIGGER messages_fts_update AFTER UPDATE OF text, file_name ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, text, file_name)
+            VALUES ('delete', old.id, old.text, old.file_name);
+            INSERT INTO messages_fts(rowid, text, file_name) VALUES (new.id, new.text, new.file_name);
+        END
+    """,
+}
+
+def normalize_sql(sql: str) -> str:
+    return ' '.join(sql.replace('IF NOT EXISTS ', '').split())
+
+# Whether the replica is streaming WAL from the primary, and how many seconds it is behind.
+# A replica that has replayed everything it received only counts as caught up while the
+# stream is live; a disconnected replica also has nothing left to replay.
+REPLICA_LAG_SQL = text("""
+    SELECT
+        EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming,
+        CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END AS lag
+""")
+
+class Database:
+    """
+    Write and read connection pools for the primary, plus an optional read replica.
+    Reads go to the replica unless it lags more than `max_replica_lag` seconds,
+    in which case they fall back to the primary's read pool. Lag is checked in the
+    background, so reads use the primary until the first check succeeds.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        read_url: Optional[str] = None,
+        write_pool_size: int = 5,
+        read_pool_size: int = 10,
+        max_replica_lag: float = 30,
+        lag_check_interval: float = 10,
+        lag_check_timeout: float = 1,
+        echo: bool = False,
+        mmap_size: int = 0,
+    ):
+        self.sqlite = is_sqlite(database_url)
+        self.mmap_size = mmap_size
+        self.write_engine = self._create_engine(database_url, write_pool_size, echo)
+        self.read_engine = self._create_engine(database_url, read_pool_size, echo, read_only=True)
+        self.replica_engine = None
+        if read_url and not self.sqlite:
+            self.replica_engine = self._create_engine(read_url, read_pool_size, echo)
 
-    return engine 
\ No newline at end of file
+        self.WriteSession = sessionmaker(self.write_engine, class_=AsyncSession, expire_on_commit=False)
+        self.PrimaryReadSession = sessionmaker(self.read_engine, class_=AsyncSession, expire_on_commit=False)
+        self.ReplicaSession = None
+        if self.replica_engine is not None:
+            self.ReplicaSession = sessionmaker(self.replica_engine, class_=AsyncSession, expire_on_commit=False)
+
+        self.max_replica_lag = max_replica_lag
+        self.lag_check_interval = lag_check_interval
+        self.lag_check_timeout = lag_check_timeout
+        self._replica_ok = False
+        self._lag_checked_at = None
+        self._lag_check = None
+
+    def _create_engine(self, database_url: str, pool_size: int, echo: bool, read_only: bool = False):
+        if not is_sqlite(database_url):
+            return create_async_engine(
+                to_async_url(database_url),
+                echo=echo,
+                pool_size=pool_size,
+                pool_pre_ping=True,
+            )
+
+        # SQLite serializes writes anyway, so leave pool sizing to the dialect defaults
+        engine = create_async_engine(to_async_url(database_url), echo=echo)
+        mmap_size = self.mmap_size
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # WAL lets the bot read while the scraper writes
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA busy_timeout=5000")
+            if mmap_size:
+                cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+            cursor.close()
+
+        return engine
+
+    @classmethod
+    def from_env(cls, database_url: Optional[str] = None) -> 'Database':
+        """Build from DATABASE_URL, DATABASE_READ_URL and the DATABASE_* tuning variables"""
+        database_url = database_url or os.getenv('DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable is required")
+
+        return cls(
+            database_url,
+            read_url=os.getenv('DATABASE_READ_URL'),
+            write_pool_size=int(os.getenv('DATABASE_WRITE_POOL_SIZE', 5)),
+            read_pool_size=int(os.getenv('DATABASE_READ_POOL_SIZE', 10)),
+            max_replica_lag=float(os.getenv('DATABASE_MAX_REPLICA_LAG', 30)),
+            echo=os.getenv('DATABASE_ECHO', '').lower() in ('1', 'true', 'yes'),
+            mmap_size=int(os.getenv('DATABASE_MMAP_SIZE', 0)),
+        )
+
+    async def create_all(self):
+        """Create all tables on the primary"""
+        async with self.write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            if self.sqlite:
+                await self._sync_sqlite_fts(conn)
+
+    async def _sync_sqlite_fts(self, conn):
+        """Create the FTS table and triggers, recreating them if their schema is outdated"""
+        result = await conn.execute(
+            text("SELECT name, sql FROM sqlite_master WHERE name IN :names")
+            .bindparams(bindparam('names', expanding=True)),
+            {'names': list(SQLITE_FTS_DDL)}
+        )
+        existing = {name: normalize_sql(sql) for name, sql in result.all()}
+        expected = {name: normalize_sql(sql) for name, sql in SQLITE_FTS_DDL.items()}
+        if existing == expected:
+            return
+
+        logger.info("Rebuilding messages_fts for the current schema")
+        for name in SQLITE_FTS_DDL:
+            if name != 'messages_fts':
+                await conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        await conn.execute(text("DROP TABLE IF EXISTS messages_fts"))
+        for statement in SQLITE_FTS_DDL.values():
+            await conn.execute(text(statement))
+        # Index rows that were stored before the FTS table existed
+        await conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+
+    async def replica_lag(self) -> Optional[float]:
+        """
+        Return the replica lag in seconds, or None if it cannot be measured.
+        A replica that is not streaming from the primary is infinitely behind.
+        """
+        try:
+            async with self.replica_engine.connect() as conn:
+                result = await conn.execute(REPLICA_LAG_SQL)
+                streaming, lag = result.one()
+        except Exception as e:
+            logger.warning(f"Replica lag check failed: {e}")
+            return None
+
+        if not streaming or lag is None:
+            logger.warning("Replica is not receiving WAL from the primary")
+            return float('inf')
+        return float(lag)
+
+    async def read_session(self) -> sessionmaker:
+        """Pick the session factory for read-only queries"""
+        if self.ReplicaSession is None:
+            return self.PrimaryReadSession
+
+        now = time.monotonic()
+        due = self._lag_checked_at is None or now - self._lag_checked_at >= self.lag_check_interval
+        if due and self._lag_check is None:
+            # One check at a time, in the background; reads keep the last routing decision meanwhile
+            self._lag_checked_at = now
+            self._lag_check = asyncio.ensure_future(self._check_replica())
+
+        return self.ReplicaSession if self._replica_ok else self.PrimaryReadSession
+
+    async def _check_replica(self):
+        try:
+            lag = await asyncio.wait_for(self.replica_lag(), self.lag_check_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Replica lag check timed out after {self.lag_check_timeout}s")
+            lag = None
+        finally:
+            self._lag_check = None
+
+        self._replica_ok = lag is not None and lag <= self.max_replica_lag
+        if lag is None:
+            logger.warning("Replica health unknown, reading from primary")
+        elif not self._replica_ok:
+            logger.warning(f"Replica lag {lag:.0f}s exceeds {self.max_replica_lag}s, reading from primary")
+
+    async def dispose(self):
+        """Close every connection pool"""
+        if self._lag_check is not None:
+            self._lag_check.cancel()
+        for engine in (self.write_engine, self.read_engine, self.replica_engine):
+            if engine is not None:
+                await engine.dispose()
+
+_database = None
+
+def get_database() -> Database:
+    """Return the process-wide Database configured from the environment"""
+    global _database
+    if _database is None:
+        _database = Database.from_env()
+    return _database
+
+async def init_db(database_url: str):
+    """Initialize database connection"""
+    database = Database.from_env(database_url)
+    await database.create_all()
+    return database.write_engine
@@ -17,9 +17,11 @@ from dotenv import load_dotenv
 from .channels import ALL_CHANNELS 
 import sys
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from .database import init_db, Channel, Message
+from .database import Database, Channel, Message
+from .scheduler import ChannelScheduler
+from .facets import extract_resources
+from .registry import load_resolved, to_input_peer
+from types import SimpleNamespace
 
 # Configure logging to handle Unicode characters
 if sys.platform == 'win32':
@@ -42,8 +44,8 @@ class TelegramScraper:
     def __init__(self, session_name: str, api_id: str, api_hash: str, phone: str, database_url: str):
         self.client = TelegramClient(session_name, api_id, api_hash)
         self.phone = phone
-        # Convert database URL to async format
-        self.database_url = database_url.replace('postgresql://', 'postgresql+asyncpg://')
+        self.database_url = database_url
+        self.db = None
         self.Session = None
         self.data_dir = "scraped_data"
         self.progress_file = "scraping_progress.json"
@@ -51,18 +53,19 @@ class TelegramScraper:
         self.batch_delay = 2  # Seconds between message batches
         self.channel_delay = 30  # Seconds between channels
         self.max_attempts = 3
+        self.scheduler = None
+        self.registry = {}  # Resolved registry entries keyed by target
         
         # Create data directory if it doesn't exist
         os.makedirs(self.data_dir, exist_ok=True)
 
     async def init_database(self):
         """Initialize database connection"""
-        engine = create_async_engine(self.database_url)
-        self.Session = sessionmaker(
-            engine, 
-            class_=AsyncSession, 
-            expire_on_commit=False
-        )
+        # The scraper only writes, so it works entirely on the primary's write pool
+        self.db = Database.from_env(self.database_url)
+        self.Session = self.db.WriteSession
+        await self.db.create_all()
+        self.scheduler = ChannelScheduler(self.Session)
 
     async def load_progress(self) -> Dict:
         """Load scraping progress from database"""
@@ -87,11 +90,17 @@ class TelegramScraper:
         async with aiofiles.open(self.progress_file, 'w') as f:
             await f.write(json.dumps(progress, indent=2))
 
-    async def save_messages(self, channel: str, messages: List):
+    async def load_registry(self) -> List[str]:
+        """Load resolved channels from the registry so they are not re-resolved"""
+        self.registry = await load_resolved(self.Session)
+        return list(self.registry)
+
+    async def save_messages(self, channel: str, messages: List, channel_entity=None):
         """Save messages to database"""
         async with self.Session() as session:
             try:
-                channel_entity = await self.client.get_entity(channel)
+                if channel_entity is None:
+                    channel_entity = await self.client.get_entity(channel)
                 result = await session.execute(
                     select(Channel).filter_by(channel_id=channel_entity.id)
                 )
@@ -107,29 +116,28 @@ class TelegramScraper:
                     )
                     session.add(db_channel)
                 
-                # Track message IDs for this batch
-                processed_ids = set()
-                
+                # Keep the first copy of each message with text or media in this batch
+                batch = {}
                 for msg in messages:
-                    if not msg or not msg.text:
-                        continue
-                    
-                    # Skip if we've already processed this message in this batch
-                    if msg.id in processed_ids:
-                        continue
-                        
-                    processed_ids.add(msg.id)
-                    
+                    if msg and (msg.text or msg.media) and msg.id not in batch:
+                        batch[msg.id] = msg
+                
+                # Look up the batch's existing rows in one query instead of one per message
+                existing = {}
+                if batch:
                     result = await session.execute(
-                        select(Message).filter_by(
-                            message_id=msg.id,
-                            channel_id=channel_entity.id
+                        select(Message).where(
+                            Message.channel_id == channel_entity.id,
+                            Message.message_id.in_(list(batch))
                         )
                     )
-                    existing_msg = result.scalar_one_or_none()
-                    
+                    existing = {m.message_id: m for m in result.scalars().all()}
+                
+                current_time = datetime.now(UTC)
+                
+                for msg in batch.values():
+                    existing_msg = existing.get(msg.id)
                     msg_date = msg.date if msg.date.tzinfo else msg.date.replace(tzinfo=UTC)
-                    current_time = datetime.now(UTC)
                     
                     if existing_msg:
                         # Update only if views/forwards have changed
@@ -139,6 +147,12 @@ class TelegramScraper:
                             existing_msg.views = new_views
                             existing_msg.forwards = new_forwards
                             existing_msg.updated_at = current_time
+                        
+                        # Rows saved before facets existed, or edited since, get their resources refreshed
+                        for column, value in extract_resources(msg).items():
+                            if getattr(existing_msg, column) != value:
+                                setattr(existing_msg, column, value)
+                                existing_msg.updated_at = current_time
                     else:
                         new_msg = Message(
                             message_id=msg.id,
@@ -147,6 +161,7 @@ class TelegramScraper:
                             text=msg.text,
                             views=getattr(msg, 'views', None),
                             forwards=getattr(msg, 'forwards', None),
+                            **extract_resources(msg),
                             created_at=current_time,
                             updated_at=current_time
                         )
@@ -184,16 +199,29 @@ class TelegramScraper:
             logger.error(f"Failed to join {channel}: {e}")
             return False
 
-    async def scrape_channel(self, channel: str, min_id: Optional[int] = None, message_limit: Optional[int] = None):
+    async def scrape_channel(self, channel: str, min_id: Optional[int] = None, message_limit: Optional[int] = None, resume: bool = False):
         """
         Scrape messages from a channel with rate limiting
         :param channel: Channel username or link
         :param min_id: Minimum message ID to fetch (messages newer than this ID)
         :param message_limit: Maximum number of messages to fetch (None for unlimited)
+        :param resume: Without min_id, fetch only messages newer than the saved progress
+        :return: List of fetched messages, or None if the channel could not be scraped
         """
         try:
+            row = self.registry.get(channel)
             channel = channel.replace('https://t.me/', '')
-            entity = await self.client.get_entity(channel)
+            if row is not None:
+                entity = to_input_peer(row)
+                channel_entity = SimpleNamespace(id=row.peer_id, username=row.username, title=row.title)
+            else:
+                entity = await self.client.get_entity(channel)
+                channel_entity = entity
+            
+            if resume and min_id is None:
+                # Progress is keyed by the resolved channel id, not the link
+                progress = await self.load_progress()
+                min_id = progress.get(str(channel_entity.id), {}).get('last_message_id')
             
             messages = []
             last_id = None
@@ -230,7 +258,7 @@ class TelegramScraper:
                     last_id = batch[-1].id
                     total_messages += len(batch)
                     
-                    await self.save_messages(channel, batch)
+                    await self.save_messages(channel, batch, channel_entity)
                     await self.save_progress(channel, last_id)
                     
                     logger.info(f"Scraped {total_messages} messages from {channel}")
@@ -252,40 +280,75 @@ class TelegramScraper:
             
         except Exception as e:
             logger.error(f"Error scraping {channel}: {e}")
-            return []
+            return None
 
     async def scrape_channels(self, channels: List[str], message_limit: int = 100):
         """
-        Scrape multiple channels with proper rate limiting
+        Scrape the channels that are currently due, most overdue first
         :param channels: List of channel usernames or links
         :param message_limit: Maximum number of messages to fetch per channel
         """
         try:
-            for channel in channels:
-                try:
-                    progress = await self.load_progress()
-                    last_message_id = progress.get(channel, {}).get('last_message_id')
-                    
-                    logger.info(f"Starting to scrape {channel}")
-                    await self.scrape_channel(channel, min_id=last_message_id, message_limit=message_limit)
-                    
-                    logger.info(f"Finished {channel}, waiting {self.channel_delay} seconds before next channel")
-                    await asyncio.sleep(self.channel_delay)
-                    
-                except FloodWaitError as e:
-                    logger.critical(f"FLOOD WARNING DETECTED! Waiting time: {e.seconds} seconds")
-                    logger.critical("Stopping all operations to protect account...")
-                    await self.client.disconnect()
-                    sys.exit(1)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing channel {channel}: {e}")
+            await self.scheduler.load(channels)
+            while (channel := self.scheduler.pop_due()) is not None:
+                await self.scrape_scheduled(channel, message_limit)
                     
         except KeyboardInterrupt:
             logger.info("Received keyboard interrupt, gracefully shutting down...")
             await self.client.disconnect()
             sys.exit(0)
 
+    async def run_scheduler(self, channels: List[str], message_limit: int = 100):
+        """
+        Keep scraping channels as they become due, sleeping until the next one
+        :param channels: List of channel usernames or links
+        :param message_limit: Maximum number of messages to fetch per channel
+        """
+        await self.scheduler.load(channels)
+        while True:
+            channel = self.scheduler.pop_due()
+            if channel is None:
+                next_due = self.scheduler.peek()
+                if next_due is None:
+                    return
+                wait = max((next_due - datetime.now(UTC)).total_seconds(), 0)
+                logger.info(f"No channels due, sleeping {wait:.0f} seconds")
+                await asyncio.sleep(wait)
+                continue
+            await self.scrape_scheduled(channel, message_limit)
+
+    async def scrape_scheduled(self, channel: str, message_limit: int):
+        """Scrape one channel and feed the outcome back into the scheduler"""
+        messages = await self.scrape_target(channel, message_limit)
+        
+        if messages is None:
+            await self.scheduler.record_failure(channel)
+        else:
+            truncated = bool(message_limit) and len(messages) >= message_limit
+            await self.scheduler.record_success(channel, messages, truncated=truncated)
+        
+        logger.info(f"Finished {channel}, waiting {self.channel_delay} seconds before next channel")
+        await asyncio.sleep(self.channel_delay)
+
+    async def scrape_target(self, channel: str, message_limit: int) -> Optional[List]:
+        """
+        Scrape new messages from one channel, resuming from its saved progress
+        :return: List of fetched messages, or None if the channel could not be scraped
+        """
+        try:
+            logger.info(f"Starting to scrape {channel}")
+            return await self.scrape_channel(channel, message_limit=message_limit, resume=True)
+            
+        except FloodWaitError as e:
+            logger.critical(f"FLOOD WARNING DETECTED! Waiting time: {e.seconds} seconds")
+            logger.critical("Stopping all operations to protect account...")
+            await self.client.disconnect()
+            sys.exit(1)
+            
+        except Exception as e:
+            logger.error(f"Error processing channel {channel}: {e}")
+            return None
+
     async def start(self):
         """Initialize the client and start scraping"""
         await self.client.connect()
@@ -312,7 +375,9 @@ async def main():
     
     await scraper.init_database()
     await scraper.start()
-    await scraper.scrape_channels(ALL_CHANNELS)
+    # Fall back to the static list until the registry has been imported and resolved
+    channels = await scraper.load_registry()
+    await scraper.scrape_channels(channels or ALL_CHANNELS)
     await scraper.client.disconnect()
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+import re
+from typing import Dict, List
+
+# Resource-type facets stored as a bitmask in messages.facets
+FACET_VIDEO = 1
+FACET_AUDIO = 2
+FACET_DOC = 4
+FACET_LINK = 8
+FACET_GROUP_INVITE = 16
+
+FACET_BITS = 5
+
+FACET_NAMES = {
+    'video': FACET_VIDEO,
+    'audio': FACET_AUDIO,
+    'doc': FACET_DOC,
+    'link': FACET_LINK,
+    'group': FACET_GROUP_INVITE,
+}
+
+TME_LINK_RE = re.compile(r'(?:https?://)?(?:t\.me|telegram\.me|telegram\.dog)/[^\s<>"\')\]]+', re.IGNORECASE)
+INVITE_LINK_RE = re.compile(r'(?:t\.me|telegram\.me|telegram\.dog)/(?:\+|joinchat/)', re.IGNORECASE)
+
+def media_type(msg) -> str:
+    """Classify a Telethon message's media, or None if it has none"""
+    if msg.video or msg.gif or msg.video_note:
+        return 'video'
+    if msg.audio or msg.voice:
+        return 'audio'
+    if msg.photo:
+        return 'photo'
+    if msg.document:
+        return 'document'
+    return None
+
+def extract_links(msg) -> List[str]:
+    """Collect t.me links from the message text and its hidden text URLs"""
+    links = TME_LINK_RE.findall(msg.text or '')
+    for entity in msg.entities or []:
+        url = getattr(entity, 'url', None)
+        if url and TME_LINK_RE.match(url):
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+def compute_facets(media: str, links: List[str]) -> int:
+    facets = 0
+    if media == 'video':
+        facets |= FACET_VIDEO
+    elif media == 'audio':
+        facets |= FACET_AUDIO
+    elif media == 'document':
+        facets |= FACET_DOC
+    if links:
+        facets |= FACET_LINK
+    if any(INVITE_LINK_RE.search(link) for link in links):
+        facets |= FACET_GROUP_INVITE
+    return facets
+
+def extract_resources(msg) -> Dict:
+    """Extract media, file and link details plus the facet bitmask from a message"""
+    media = media_type(msg)
+    file = msg.file if media else None
+    links = extract_links(msg)
+    return {
+        'media_type': media,
+        'file_name': file.name[:255] if file and file.name else None,
+        'file_size': file.size if file else None,
+        'links': '\n'.join(links) or None,
+        'facets': compute_facets(media, links),
+    }
+
+def facet_values(mask: int) -> List[int]:
+    """
+    Every facets value that contains all bits of `mask`.
+    Filtering with IN over this list lets the b-tree index on messages.facets narrow
+    the candidates, which a bitwise AND in the WHERE clause would not.
+    """
+    return [value for value in range(1 << FACET_BITS) if value & mask == mask]
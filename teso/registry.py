@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime, UTC
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import select
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.messages import CheckChatInviteRequest
+from telethon.tl.types import Channel as TgChannel, Chat as TgChat, ChatInviteAlready, ChatInvitePeek, InputPeerChannel, InputPeerChat
+from .database import ChannelRegistry, Database
+
+logger = logging.getLogger(__name__)
+
+USERNAME_RE = re.compile(r'^[A-Za-z][A-Za-z0-9_]{3,31}$')
+INVITE_RE = re.compile(r'^(?:\+|joinchat/)([A-Za-z0-9_-]+)$')
+LINK_PREFIX_RE = re.compile(r'^(?:https?://)?(?:www\.)?(?:t\.me|telegram\.me|telegram\.dog)/', re.IGNORECASE)
+
+IMPORT_CHUNK_SIZE = 1000
+
+def classify(entry: str) -> Tuple[str, str]:
+    """
+    Classify a channel entry and normalize it to a t.me link
+    :return: (kind, target) where kind is one of public, invite or invalid
+    """
+    raw = entry.strip()
+    path = LINK_PREFIX_RE.sub('', raw).lstrip('@').split('?')[0].rstrip('/')
+
+    invite = INVITE_RE.match(path)
+    if invite:
+        return 'invite', f"https://t.me/+{invite.group(1)}"
+
+    if USERNAME_RE.match(path):
+        # Bots are only told apart by resolving, since channel names may end in "bot" too
+        return 'public', f"https://t.me/{path}"
+
+    return 'invalid', raw
+
+async def import_channels(Session, entries: Iterable[str]) -> Dict[str, int]:
+    """
+    Classify entries and insert the new ones into the registry in chunks.
+    Invalid entries are stored as skipped so they are never resolved.
+    :return: Count of newly imported entries per kind
+    """
+    classified = {}
+    for entry in entries:
+        if not entry.strip() or entry.lstrip().startswith('#'):
+            continue
+        kind, target = classify(entry)
+        classified.setdefault(target, kind)
+
+    counts = {}
+    targets = list(classified)
+    async with Session() as session:
+        for i in range(0, len(targets), IMPORT_CHUNK_SIZE):
+            chunk = targets[i:i + IMPORT_CHUNK_SIZE]
+            result = await session.execute(
+                select(ChannelRegistry.target).where(ChannelRegistry.target.in_(chunk))
+            )
+            existing = set(result.scalars().all())
+
+            for target in chunk:
+                if target in existing:
+                    continue
+                kind = classified[target]
+                session.add(ChannelRegistry(
+                    target=target,
+                    kind=kind,
+                    status='pending' if kind in ('public', 'invite') else 'skipped',
+                ))
+                counts[kind] = counts.get(kind, 0) + 1
+            await session.commit()
+
+    return counts
+
+async def resolve_entry(client, row: ChannelRegistry):
+    """Resolve a single registry row to a peer, updating it in place"""
+    if row.kind == 'invite':
+        invite = await client(CheckChatInviteRequest(row.target.rsplit('+', 1)[-1]))
+        if not isinstance(invite, (ChatInviteAlready, ChatInvitePeek)):
+            row.status = 'failed'
+            row.error = 'Invite link requires joining before it can be resolved'
+            return
+        entity = invite.chat
+    else:
+        entity = await client.get_entity(row.target.replace('https://t.me/', ''))
+
+    if not isinstance(entity, (TgChannel, TgChat)):
+        # Usernames that turn out to be users or bots
+        row.status = 'skipped'
+        row.error = f"Not a channel or group: {type(entity).__name__}"
+        return
+
+    row.peer_id = entity.id
+    row.access_hash = getattr(entity, 'access_hash', None)
+    row.username = getattr(entity, 'username', None)
+    row.title = getattr(entity, 'title', None)
+    row.status = 'resolved'
+    row.error = None
+    row.resolved_at = datetime.now(UTC)
+
+async def resolve_pending(client, Session, batch_size: int = 20, request_delay: float = 2, batch_delay: float = 30, retry_failed: bool = False) -> int:
+    """
+    Resolve pending registry entries in rate-limited batches
+    :param batch_size: Entries resolved per batch
+    :param request_delay: Seconds between resolve requests
+    :param batch_delay: Seconds between batches
+    :param retry_failed: Also retry entries that previously failed
+    :return: Number of entries resolved
+    """
+    statuses = ['pending', 'failed'] if retry_failed else ['pending']
+    resolved = 0
+    last_id = 0
+
+    while True:
+        async with Session() as session:
+            result = await session.execute(
+                select(ChannelRegistry)
+                .where(ChannelRegistry.status.in_(statuses), ChannelRegistry.id > last_id)
+                .order_by(ChannelRegistry.id)
+                .limit(batch_size)
+            )
+            rows = result.scalars().all()
+            if not rows:
+                return resolved
+
+            for row in rows:
+                last_id = row.id
+                try:
+                    await resolve_entry(client, row)
+                except FloodWaitError as e:
+                    # Keep what this batch resolved and leave the rest pending
+                    logger.critical(f"FLOOD WARNING DETECTED! Waiting time: {e.seconds} seconds")
+                    await session.commit()
+                    return resolved
+                except Exception as e:
+                    row.status = 'failed'
+                    row.error = str(e)
+
+                if row.status == 'resolved':
+                    resolved += 1
+                logger.info(f"{row.target}: {row.status}")
+                await asyncio.sleep(request_delay)
+
+            await session.commit()
+
+        await asyncio.sleep(batch_delay)
+
+async def load_resolved(Session) -> Dict[str, ChannelRegistry]:
+    """Load every resolved registry entry, keyed by target, in one query"""
+    async with Session() as session:
+        result = await session.execute(
+            select(ChannelRegistry)
+            .where(ChannelRegistry.status == 'resolved')
+            .order_by(ChannelRegistry.id)
+        )
+        return {row.target: row for row in result.scalars().all()}
+
+def to_input_peer(row: ChannelRegistry):
+    """Build an input peer from a resolved entry, so no resolve request is needed"""
+    if row.access_hash is None:
+        return InputPeerChat(row.peer_id)
+    return InputPeerChannel(row.peer_id, row.access_hash)
+
+async def main():
+    from .channels import ALL_CHANNELS
+    from .engine import TelegramScraper
+
+    parser = argparse.ArgumentParser(description="Manage the channel registry")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Import channels from a file, one per line")
+    import_parser.add_argument('file', nargs='?', help="Defaults to the channels in teso/channels.py")
+    resolve_parser = subparsers.add_parser('resolve', help="Resolve pending channels")
+    resolve_parser.add_argument('--batch-size', type=int, default=20)
+    resolve_parser.add_argument('--retry-failed', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        # Importing only writes rows, so it needs no Telegram credentials
+        db = Database.from_env()
+        await db.create_all()
+        if args.file:
+            with open(args.file, encoding='utf-8') as f:
+                entries = f.read().splitlines()
+        else:
+            entries = ALL_CHANNELS
+        counts = await import_channels(db.WriteSession, entries)
+        logger.info(f"Imported {sum(counts.values())} new channels: {counts}")
+        await db.dispose()
+    else:
+        database_url = os.getenv('DATABASE_URL')
+        if not database_url:
+            raise ValueError("DATABASE_URL environment variable is required")
+
+        scraper = TelegramScraper(
+            "my_telegram_session",
+            os.getenv('API_ID'),
+            os.getenv('API_HASH'),
+            os.getenv('PHONE'),
+            database_url
+        )
+        await scraper.init_database()
+        await scraper.start()
+        resolved = await resolve_pending(
+            scraper.client,
+            scraper.Session,
+            batch_size=args.batch_size,
+            retry_failed=args.retry_failed
+        )
+        logger.info(f"Resolved {resolved} channels")
+        await scraper.client.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+import heapq
+import logging
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from .database import ChannelSchedule
+
+logger = logging.getLogger(__name__)
+
+class ChannelScheduler:
+    """
+    Priority queue of channels ordered by their next fetch time.
+    Each channel's posting rate is estimated from the timestamps of the messages
+    it returns, and the next fetch is scheduled for when about `target_batch`
+    new messages are expected. Failing channels back off exponentially.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        target_batch: int = 20,
+        min_interval: timedelta = timedelta(minutes=10),
+        max_interval: timedelta = timedelta(days=1),
+        max_backoff: timedelta = timedelta(days=7),
+        smoothing: float = 0.5,
+    ):
+        self.Session = session_factory
+        self.target_batch = target_batch
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.smoothing = smoothing  # Weight of the newest rate sample
+        self.entries: Dict[str, ChannelSchedule] = {}
+        self.queue: List = []
+
+    async def load(self, channels: List[str]):
+        """Load persisted schedules, adding new channels as due immediately"""
+        now = datetime.now(UTC)
+        async with self.Session() as session:
+            result = await session.execute(
+                select(ChannelSchedule).where(ChannelSchedule.target.in_(channels))
+            )
+            self.entries = {row.target: row for row in result.scalars().all()}
+
+            for channel in channels:
+                if channel not in self.entries:
+                    entry = ChannelSchedule(
+                        target=channel,
+                        next_fetch_at=now,
+                        last_fetched_at=None,
+                        post_rate=None,
+                        failure_count=0
+                    )
+                    session.add(entry)
+                    self.entries[channel] = entry
+            await session.commit()
+
+        self.queue = [(entry.next_fetch_at, target) for target, entry in self.entries.items()]
+        heapq.heapify(self.queue)
+
+    def peek(self) -> Optional[datetime]:
+        """Return the time the next channel becomes due, or None if empty"""
+        self._drop_stale()
+        return self.queue[0][0] if self.queue else None
+
+    def pop_due(self, now: Optional[datetime] = None) -> Optional[str]:
+        """Pop the most overdue channel, or None if nothing is due yet"""
+        now = now or datetime.now(UTC)
+        self._drop_stale()
+        if not self.queue or self.queue[0][0] > now:
+            return None
+        _, target = heapq.heappop(self.queue)
+        return target
+
+    def _drop_stale(self):
+        # Rescheduling pushes a new heap item, so skip items whose time no longer matches
+        while self.queue:
+            due_at, target = self.queue[0]
+            entry = self.entries.get(target)
+            if entry is not None and entry.next_fetch_at == due_at:
+                return
+            heapq.heappop(self.queue)
+
+    def estimate_rate(self, entry: ChannelSchedule, dates: List[datetime], now: datetime) -> Optional[float]:
+        """
+        Blend a new messages-per-hour sample into the channel's running estimate
+        :param dates: Dates of messages posted since the previous fetch
+        """
+        if entry.last_fetched_at is not None:
+            window_start = entry.last_fetched_at
+        elif dates:
+            window_start = min(dates)
+        else:
+            return entry.post_rate
+
+        hours = max((now - window_start).total_seconds() / 3600, 1 / 60)
+        sample = len(dates) / hours
+        if entry.post_rate is None:
+            return sample
+        return self.smoothing * sample + (1 - self.smoothing) * entry.post_rate
+
+    def plan_success(self, entry: ChannelSchedule, messages: List, truncated: bool = False) -> timedelta:
+        """
+        Update the entry's rate estimate and next fetch time in place
+        :param truncated: True if the fetch hit its message limit, so a backlog may remain
+        :return: Interval until the next fetch
+        """
+        now = datetime.now(UTC)
+        dates = [
+            m.date if m.date.tzinfo else m.date.replace(tzinfo=UTC)
+            for m in messages if m and m.date
+        ]
+        if entry.last_fetched_at is not None:
+            # Messages already seen by the previous fetch say nothing about the current rate
+            dates = [d for d in dates if d > entry.last_fetched_at]
+        # A full batch of old messages is not a backlog
+        truncated = truncated and bool(dates)
+
+        entry.post_rate = self.estimate_rate(entry, dates, now)
+        entry.failure_count = 0
+        entry.last_fetched_at = now
+
+        if truncated or not entry.post_rate:
+            interval = self.min_interval if truncated else self.max_interval
+        else:
+            interval = timedelta(hours=self.target_batch / entry.post_rate)
+        interval = min(max(interval, self.min_interval), self.max_interval)
+
+        entry.next_fetch_at = now + interval
+        logger.info(
+            f"{entry.target}: ~{entry.post_rate or 0:.2f} msgs/hour, next fetch in {interval}"
+        )
+        return interval
+
+    def plan_failure(self, entry: ChannelSchedule) -> timedelta:
+        """
+        Back the entry off exponentially after a failed fetch, in place
+        :return: Interval until the next fetch
+        """
+        entry.failure_count = (entry.failure_count or 0) + 1
+
+        backoff = min(self.min_interval * (2 ** min(entry.failure_count, 16)), self.max_backoff)
+        entry.next_fetch_at = datetime.now(UTC) + backoff
+        logger.warning(f"{entry.target}: failure #{entry.failure_count}, backing off for {backoff}")
+        return backoff
+
+    async def record_success(self, channel: str, messages: List, truncated: bool = False):
+        """Update the rate estimate and schedule the next fetch"""
+        entry = self.entries[channel]
+        self.plan_success(entry, messages, truncated)
+        await self._reschedule(entry)
+
+    async def record_failure(self, channel: str):
+        """Back off exponentially after a failed fetch"""
+        entry = self.entries[channel]
+        self.plan_failure(entry)
+        await self._reschedule(entry)
+
+    async def _reschedule(self, entry: ChannelSchedule):
+        heapq.heappush(self.queue, (entry.next_fetch_at, entry.target))
+        async with self.Session() as session:
+            try:
+                await session.merge(entry)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Database error: {e}")
@@ -1,41 +1,44 @@
 import asyncio
-from sqlalchemy import select, desc, or_
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select, desc, or_, text
 from dotenv import load_dotenv
-import os
-from .database import Message, Channel
+from .database import Message, Channel, get_database
+from .facets import facet_values
 
-async def search_messages(keyword: str, limit: int = 5):
+def keyword_filter(keyword: str, sqlite: bool):
+    """Build the text match condition for the configured backend"""
+    # The trigram FTS index only covers keywords of 3+ characters
+    if sqlite and len(keyword) >= 3:
+        phrase = '"' + keyword.replace('"', '""') + '"'
+        return text(
+            "messages.id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH :phrase)"
+        ).bindparams(phrase=phrase)
+    return or_(
+        Message.text.ilike(f'%{keyword}%'),
+        Message.file_name.ilike(f'%{keyword}%')
+    )
+
+async def search_messages(keyword: str, limit: int = 5, facets: int = 0):
     """
     Search for messages containing the keyword and return top viewed results
+    :param facets: Bitmask of teso.facets FACET_* flags every result must have
     """
     load_dotenv()
-    database_url = os.getenv('DATABASE_URL')
-    print(database_url)
-    if not database_url:
-        raise ValueError("DATABASE_URL environment variable is required")
-        
-    # Convert to async URL
-    database_url = database_url.replace('postgresql://', 'postgresql+asyncpg://')
-    
-    # Create async engine and session
-    engine = create_async_engine(database_url)
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # Reads use the shared read pool, served by the replica when it is caught up
+    database = get_database()
+    async_session = await database.read_session()
     
     async with async_session() as session:
         # Query messages and join with channels
         query = (
             select(Message, Channel)
             .join(Channel, Message.channel_id == Channel.channel_id)
-            .where(
-                or_(
-                    Message.text.ilike(f'%{keyword}%')
-                )
-            )
+            .where(keyword_filter(keyword, database.sqlite))
             .order_by(desc(Message.views))
             .limit(limit)
         )
+        if facets:
+            # Narrow candidates through the facets index before matching text
+            query = query.where(Message.facets.in_(facet_values(facets)))
         
         result = await session.execute(query)
         messages = result.all()
@@ -43,11 +46,18 @@ async def search_messages(keyword: str, limit: int = 5):
         # Format results
         search_results = []
         for msg, channel in messages:
+            message_text = msg.text or msg.file_name or ''
             search_results.append({
                 'channel_name': channel.username or channel.title,
-                'message_text': msg.text[:200] + '...' if len(msg.text) > 200 else msg.text,
+                'channel_username': channel.username,
+                'message_id': msg.message_id,
+                'full_text': msg.text,
+                'message_text': message_text[:200] + '...' if len(message_text) > 200 else message_text,
                 'views': msg.views or 0,
-                'date': msg.date.strftime('%Y-%m-%d %H:%M:%S')
+                'date': msg.date.strftime('%Y-%m-%d %H:%M:%S'),
+                'media_type': msg.media_type,
+                'file_name': msg.file_name,
+                'file_size': msg.file_size
             })
             
         return search_results
@@ -0,0 +1,199 @@
+import asyncio
+import difflib
+import heapq
+import logging
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional
+from sqlalchemy import select, func
+from .database import Channel, Message, SearchLog
+
+logger = logging.getLogger(__name__)
+
+CJK_RUN_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[a-z0-9][a-z0-9_\-]{2,}')
+
+def extract_ngrams(text: str) -> List[str]:
+    """Latin words plus CJK bigrams and trigrams, since CJK text has no word boundaries"""
+    text = text.lower()
+    ngrams = WORD_RE.findall(text)
+    for run in CJK_RUN_RE.findall(text):
+        for n in (2, 3):
+            ngrams.extend(run[i:i + n] for i in range(len(run) - n + 1))
+    return ngrams
+
+class SuggestionIndex:
+    """
+    In-memory prefix index for completions and corrections, answered without a database
+    round-trip. Terms come from logged searches, channel titles and usernames, and frequent
+    n-grams in message text. Terms are kept in a sorted array; prefixes up to `node_depth`
+    characters also store their top-k terms, since short prefixes match the most terms.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 5,
+        node_depth: int = 2,
+        min_ngram_count: int = 5,
+        max_ngram_candidates: int = 200000,
+        message_batch_size: int = 5000,
+        max_messages_per_refresh: int = 50000,
+    ):
+        self.top_k = top_k
+        self.node_depth = node_depth
+        self.min_ngram_count = min_ngram_count
+        self.max_ngram_candidates = max_ngram_candidates
+        self.message_batch_size = message_batch_size
+        self.max_messages_per_refresh = max_messages_per_refresh
+
+        self.query_counts = Counter()
+        self.ngram_counts = Counter()
+        self.ngram_errors: Dict[str, int] = {}  # Term -> count inherited when it entered a full counter
+        self.channel_terms = set()
+        self.last_log_id = 0
+        self.last_message_id = 0
+
+        # Swapped in whole by refresh, so lookups never see a half-built index
+        self.terms: List[str] = []
+        self.weights: Dict[str, float] = {}
+        self.top: Dict[str, List[str]] = {}
+
+    async def refresh(self, Session):
+        """Fold in searches and messages added since the last refresh, then rebuild"""
+        async with Session() as session:
+            result = await session.execute(
+                select(func.max(SearchLog.id), SearchLog.keyword, func.count())
+                # Searches that found nothing would only suggest more dead ends
+                .where(SearchLog.id > self.last_log_id, SearchLog.result_count > 0)
+                .group_by(SearchLog.keyword)
+            )
+            for last_id, keyword, count in result.all():
+                self.query_counts[keyword.strip().lower()] += count
+                self.last_log_id = max(self.last_log_id, last_id)
+
+            result = await session.execute(select(Channel.username, Channel.title))
+            self.channel_terms = {
+                term.strip().lower()
+                for row in result.all()
+                for term in row if term
+            }
+
+            scanned = 0
+            while scanned < self.max_messages_per_refresh:
+                result = await session.execute(
+                    select(Message.id, Message.text)
+                    .where(Message.id > self.last_message_id)
+                    .order_by(Message.id)
+                    .limit(self.message_batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                # Counting is CPU-bound, so keep it off the event loop serving inline queries
+                await asyncio.to_thread(self._count_ngrams, [text for _, text in rows if text])
+                self.last_message_id = rows[-1][0]
+                scanned += len(rows)
+
+        self.terms, self.weights, self.top = await asyncio.to_thread(self._build)
+        logger.info(f"Suggestion index rebuilt with {len(self.terms)} terms")
+
+    def _count_ngrams(self, texts: List[str]):
+        """
+        Space-saving count of message n-grams, bounded to `max_ngram_candidates` terms.
+        Once the counter is full, a new term starts from the smallest tracked count, since it
+        may have been seen that often before being evicted, so recurring new terms can still
+        displace stale ones. `ngram_errors` records that possible overestimate.
+        """
+        batch = Counter()
+        for text in texts:
+            batch.update(extract_ngrams(text))
+
+        counts = self.ngram_counts
+        floor = min(counts.values()) if len(counts) >= self.max_ngram_candidates else 0
+        for term, count in batch.items():
+            if term not in counts and floor:
+                counts[term] = floor
+                self.ngram_errors[term] = floor
+            counts[term] += count
+
+        if len(counts) > self.max_ngram_candidates:
+            self.ngram_counts = Counter(dict(counts.most_common(self.max_ngram_candidates)))
+            self.ngram_errors = {
+                term: error for term, error in self.ngram_errors.items()
+                if term in self.ngram_counts
+            }
+
+    def _build(self):
+        # Only counts actually observed, so inherited counts alone never index a term
+        weights = {}
+        for term, count in self.ngram_counts.items():
+            count -= self.ngram_errors.get(term, 0)
+            if count >= self.min_ngram_count:
+                weights[term] = count
+        for term in self.channel_terms:
+            weights[term] = weights.get(term, 0) + 50
+        for term, count in self.query_counts.items():
+            if term:
+                weights[term] = weights.get(term, 0) + 10 * count
+
+        top = {}
+        for term in sorted(weights, key=weights.get, reverse=True):
+            for depth in range(1, min(self.node_depth, len(term)) + 1):
+                node = top.setdefault(term[:depth], [])
+                if len(node) < self.top_k + 1:
+                    node.append(term)
+
+        return sorted(weights), weights, top
+
+    def _prefix_range(self, prefix: str) -> range:
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + '\U0010ffff')
+        return range(lo, hi)
+
+    def complete(self, prefix: str, k: Optional[int] = None) -> List[str]:
+        """Highest-weighted terms starting with `prefix`, excluding `prefix` itself"""
+        k = k or self.top_k
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        if len(prefix) <= self.node_depth:
+            candidates = self.top.get(prefix, [])
+        else:
+            terms = self.terms
+            candidates = [
+                terms[i] for i in heapq.nlargest(
+                    k + 1, self._prefix_range(prefix), key=lambda i: self.weights[terms[i]]
+                )
+            ]
+        return [term for term in candidates if term != prefix][:k]
+
+    def correct(self, keyword: str, k: Optional[int] = None, pool_size: int = 500) -> List[str]:
+        """Close spellings among the heaviest terms sharing the keyword's first character"""
+        k = k or self.top_k
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return []
+
+        terms = self.terms
+        pool = [
+            terms[i] for i in heapq.nlargest(
+                pool_size, self._prefix_range(keyword[0]), key=lambda i: self.weights[terms[i]]
+            )
+        ]
+        return [term for term in difflib.get_close_matches(keyword, pool, n=k + 1, cutoff=0.6) if term != keyword][:k]
+
+    def suggest(self, keyword: str, k: Optional[int] = None) -> List[str]:
+        """Completions of the keyword, or corrections if nothing completes it"""
+        return self.complete(keyword, k) or self.correct(keyword, k)
+
+async def log_search(Session, keyword: str, result_count: int):
+    """Record a search so its keyword feeds future suggestions"""
+    async with Session() as session:
+        try:
+            session.add(SearchLog(keyword=keyword[:255], result_count=result_count))
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Database error: {e}")
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.exc import IntegrityError
+from .database import ChannelSchedule, ChannelRegistry
+
+logger = logging.getLogger(__name__)
+
+class LeaseQueue:
+    """
+    Channel jobs shared by any number of scraper processes through the channel_schedules table.
+    A worker claims a due channel with SELECT ... FOR UPDATE SKIP LOCKED and holds a
+    time-bounded lease on it, renewed by heartbeats. Leases that are not renewed expire
+    and the channel becomes claimable again. Requires Postgres.
+    :param registry_only: Only claim channels resolved in the channel registry
+    """
+
+    def __init__(self, session_factory, worker_id: str, lease_duration: timedelta = timedelta(minutes=5), registry_only: bool = False):
+        self.Session = session_factory
+        self.worker_id = worker_id
+        self.lease_duration = lease_duration
+        self.registry_only = registry_only
+
+    async def claim(self) -> Optional[ChannelSchedule]:
+        """Lease the most overdue unleased channel, or return None if nothing is due"""
+        async with self.Session() as session:
+            # Database time keeps leases consistent across machines with skewed clocks
+            now = func.now()
+            query = (
+                select(ChannelSchedule)
+                .where(
+                    ChannelSchedule.next_fetch_at <= now,
+                    or_(
+                        ChannelSchedule.lease_expires_at.is_(None),
+                        ChannelSchedule.lease_expires_at < now
+                    )
+                )
+                .order_by(ChannelSchedule.next_fetch_at)
+                .limit(1)
+                .with_for_update(skip_locked=True, of=ChannelSchedule)
+            )
+            if self.registry_only:
+                # A join keeps the query small however many channels are registered
+                query = query.join(
+                    ChannelRegistry, ChannelRegistry.target == ChannelSchedule.target
+                ).where(ChannelRegistry.status == 'resolved')
+
+            result = await session.execute(query)
+            entry = result.scalar_one_or_none()
+            if entry is None:
+                return None
+
+            if entry.lease_owner is not None:
+                logger.warning(f"Reclaiming expired lease on {entry.target} from {entry.lease_owner}")
+            entry.lease_owner = self.worker_id
+            entry.lease_expires_at = now + self.lease_duration
+            await session.commit()
+            await session.refresh(entry)
+            return entry
+
+    async def heartbeat(self, entry: ChannelSchedule) -> bool:
+        """Extend the lease, returning False if another worker has taken it over"""
+        async with self.Session() as session:
+            result = await session.execute(
+                update(ChannelSchedule)
+                .where(
+                    ChannelSchedule.id == entry.id,
+                    ChannelSchedule.lease_owner == self.worker_id
+                )
+                .values(lease_expires_at=func.now() + self.lease_duration)
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def keep_alive(self, entry: ChannelSchedule):
+        """Heartbeat until cancelled, returning once the lease is lost"""
+        while True:
+            await asyncio.sleep(self.lease_duration.total_seconds() / 3)
+            try:
+                if not await self.heartbeat(entry):
+                    logger.warning(f"Lost lease on {entry.target}")
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat failed for {entry.target}: {e}")
+
+    async def release(self, entry: ChannelSchedule) -> bool:
+        """Store the entry's new schedule and drop the lease, if this worker still holds it"""
+        async with self.Session() as session:
+            result = await session.execute(
+                update(ChannelSchedule)
+                .where(
+                    ChannelSchedule.id == entry.id,
+                    ChannelSchedule.lease_owner == self.worker_id
+                )
+                .values(
+                    next_fetch_at=entry.next_fetch_at,
+                    last_fetched_at=entry.last_fetched_at,
+                    post_rate=entry.post_rate,
+                    failure_count=entry.failure_count,
+                    lease_owner=None,
+                    lease_expires_at=None
+                )
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+async def run_worker(scraper, channels: list, message_limit: int = 100, poll_interval: float = 30, worker_id: Optional[str] = None, registry_only: bool = False):
+    """
+    Claim and scrape channels from the shared queue until interrupted
+    :param scraper: Started TelegramScraper with its database initialized
+    :param channels: Channels to seed into the queue
+    :param poll_interval: Seconds to sleep when no channel is due
+    :param registry_only: Only claim channels resolved in the channel registry
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    queue = LeaseQueue(scraper.Session, worker_id, registry_only=registry_only)
+
+    try:
+        await scraper.scheduler.load(channels)
+    except IntegrityError:
+        # Another worker seeded the same channels concurrently
+        await scraper.scheduler.load(channels)
+
+    logger.info(f"Worker {worker_id} started")
+    while True:
+        entry = await queue.claim()
+        if entry is None:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        scrape = asyncio.ensure_future(scraper.scrape_target(entry.target, message_limit))
+        heartbeat = asyncio.ensure_future(queue.keep_alive(entry))
+        await asyncio.wait({scrape, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+
+        if not scrape.done():
+            # Lease lost, so the channel now belongs to another worker
+            scrape.cancel()
+            continue
+        heartbeat.cancel()
+
+        messages = scrape.result()
+        if messages is None:
+            scraper.scheduler.plan_failure(entry)
+        else:
+            truncated = bool(message_limit) and len(messages) >= message_limit
+            scraper.scheduler.plan_success(entry, messages, truncated=truncated)
+
+        if not await queue.release(entry):
+            logger.warning(f"Lease on {entry.target} expired before release")
+
+        await asyncio.sleep(scraper.channel_delay)
+
+async def main():
+    from .channels import ALL_CHANNELS
+    from .engine import TelegramScraper
+
+    parser = argparse.ArgumentParser(description="Run a scraper worker on the shared channel queue")
+    parser.add_argument('--session', default="my_telegram_session", help="Telethon session name, one per worker")
+    parser.add_argument('--message-limit', type=int, default=100)
+    parser.add_argument('--poll-interval', type=float, default=30)
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable is required")
+
+    scraper = TelegramScraper(
+        args.session,
+        os.getenv('API_ID'),
+        os.getenv('API_HASH'),
+        os.getenv('PHONE'),
+        database_url
+    )
+
+    await scraper.init_database()
+    await scraper.start()
+    channels = await scraper.load_registry()
+    try:
+        await run_worker(
+            scraper,
+            channels or ALL_CHANNELS,
+            message_limit=args.message_limit,
+            poll_interval=args.poll_interval,
+            registry_only=bool(channels)
+        )
+    finally:
+        await scraper.client.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from teso import cache
+from teso.cache import SearchCache
+
+def result(text):
+    return {'full_text': text, 'file_name': None}
+
+def test_complete_prefix_answers_exactly(monkeypatch):
+    async def search_messages(keyword, limit, facets):
+        return [result('movie night'), result('music')]
+    monkeypatch.setattr(cache, 'search_messages', search_messages)
+    search_cache = SearchCache(limit=20)
+
+    age, results, exact = asyncio.run(search_cache.search('m'))
+    assert exact and len(results) == 2
+
+    age, results, exact = search_cache.lookup('mov')
+    assert exact and [r['full_text'] for r in results] == ['movie night']
+
+def test_timeout_answer_is_not_exact(monkeypatch):
+    async def search_messages(keyword, limit, facets):
+        await asyncio.sleep(0.2)
+        return [result('movie night')]
+    monkeypatch.setattr(cache, 'search_messages', search_messages)
+    search_cache = SearchCache(limit=20)
+
+    async def run():
+        answer = await search_cache.search('movie', timeout=0.01)
+        # The slow query still lands in the cache for the next keystroke
+        await asyncio.sleep(0.3)
+        return answer, search_cache.lookup('movie')
+
+    (age, results, exact), cached = asyncio.run(run())
+    assert results == [] and not exact
+    assert cached[2] and len(cached[1]) == 1
+
+def test_database_errors_reach_the_caller(monkeypatch):
+    async def search_messages(keyword, limit, facets):
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(cache, 'search_messages', search_messages)
+    search_cache = SearchCache()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(search_cache.search('movie', timeout=1))
+    assert not search_cache.pending
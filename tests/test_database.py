@@ -0,0 +1,86 @@
+import asyncio
+from sqlalchemy import text
+from teso.database import Database
+
+OLD_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE messages_fts USING fts5(
+        text, content='messages', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+def fts_matches(database, phrase):
+    async def run():
+        async with database.read_engine.connect() as conn:
+            result = await conn.execute(
+                text("SELECT rowid FROM messages_fts WHERE messages_fts MATCH :phrase"),
+                {'phrase': f'"{phrase}"'}
+            )
+            return [row[0] for row in result.all()]
+    return asyncio.run(run())
+
+def test_sqlite_fts_indexes_new_messages(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'teso.db'}")
+
+    async def setup():
+        await database.create_all()
+        async with database.write_engine.begin() as conn:
+            await conn.execute(text(
+                "INSERT INTO messages (id, text, file_name) VALUES (1, '中文资源包', 'movie.mkv')"
+            ))
+    asyncio.run(setup())
+
+    assert fts_matches(database, '资源包') == [1]
+    assert fts_matches(database, 'movie') == [1]
+
+def test_sqlite_fts_rebuilds_outdated_schema(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'teso.db'}")
+
+    async def setup():
+        async with database.write_engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE messages (id INTEGER PRIMARY KEY, message_id BIGINT, text TEXT)"
+            ))
+            await conn.execute(text("INSERT INTO messages (id, text) VALUES (1, 'before fts')"))
+            for statement in OLD_FTS_DDL:
+                await conn.execute(text(statement))
+            await conn.execute(text("ALTER TABLE messages ADD COLUMN file_name VARCHAR(255)"))
+            await conn.execute(text(
+                "INSERT INTO messages (id, text, file_name) VALUES (2, 'after fts', 'movie.mkv')"
+            ))
+        await database.create_all()
+        # Running again on an up-to-date schema keeps the index intact
+        await database.create_all()
+    asyncio.run(setup())
+
+    assert fts_matches(database, 'movie') == [2]
+    assert fts_matches(database, 'fts') == [1, 2]
+
+def test_replica_lag_check_runs_once_in_background():
+    database = Database("postgresql://teso@localhost/teso", read_url="postgresql://teso@replica/teso", lag_check_timeout=0.1)
+    checks = []
+
+    async def unreachable_replica():
+        checks.append(1)
+        await asyncio.sleep(60)
+
+    database.replica_lag = unreachable_replica
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        routed = await asyncio.gather(*(database.read_session() for _ in range(10)))
+        elapsed = asyncio.get_running_loop().time() - started
+        await asyncio.sleep(0.2)
+        return routed, elapsed
+
+    routed, elapsed = asyncio.run(run())
+    assert elapsed < 0.05
+    assert len(checks) == 1
+    assert all(session is database.PrimaryReadSession for session in routed)
+    assert database._lag_check is None and not database._replica_ok
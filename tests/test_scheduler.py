@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+from teso.database import ChannelSchedule
+from teso.scheduler import ChannelScheduler
+
+def make_entry(**kwargs):
+    defaults = dict(target="https://t.me/example", last_fetched_at=None, post_rate=None, failure_count=0)
+    defaults.update(kwargs)
+    return ChannelSchedule(**defaults)
+
+def make_messages(dates):
+    return [SimpleNamespace(date=d) for d in dates]
+
+def test_old_messages_do_not_count_as_new():
+    scheduler = ChannelScheduler(None)
+    now = datetime.now(UTC)
+    entry = make_entry(last_fetched_at=now - timedelta(minutes=10), post_rate=0.01)
+    year_old = [now - timedelta(days=365, minutes=i) for i in range(100)]
+
+    interval = scheduler.plan_success(entry, make_messages(year_old), truncated=True)
+
+    assert entry.post_rate < 0.01
+    assert interval == scheduler.max_interval
+
+def test_new_messages_set_interval_from_rate():
+    scheduler = ChannelScheduler(None, target_batch=20)
+    now = datetime.now(UTC)
+    entry = make_entry(last_fetched_at=now - timedelta(hours=10))
+    recent = [now - timedelta(hours=i) for i in range(10)]
+
+    interval = scheduler.plan_success(entry, make_messages(recent))
+
+    assert abs(entry.post_rate - 1.0) < 0.01
+    assert abs(interval - timedelta(hours=20)) < timedelta(minutes=1)
+    assert entry.failure_count == 0
+    assert entry.next_fetch_at > now
+
+def test_first_fetch_uses_message_span():
+    scheduler = ChannelScheduler(None)
+    now = datetime.now(UTC)
+    entry = make_entry()
+    daily = [now - timedelta(days=i) for i in range(1, 11)]
+
+    scheduler.plan_success(entry, make_messages(daily))
+
+    assert 10 / 241 < entry.post_rate < 10 / 239
+
+def test_truncated_batch_of_new_messages_polls_soon():
+    scheduler = ChannelScheduler(None)
+    now = datetime.now(UTC)
+    entry = make_entry(last_fetched_at=now - timedelta(hours=1))
+    recent = [now - timedelta(seconds=i) for i in range(100)]
+
+    interval = scheduler.plan_success(entry, make_messages(recent), truncated=True)
+
+    assert interval == scheduler.min_interval
+
+def test_failures_back_off_exponentially_up_to_max():
+    scheduler = ChannelScheduler(None, min_interval=timedelta(minutes=10), max_backoff=timedelta(days=7))
+    entry = make_entry()
+
+    backoffs = [scheduler.plan_failure(entry) for _ in range(3)]
+
+    assert backoffs == [timedelta(minutes=20), timedelta(minutes=40), timedelta(minutes=80)]
+    assert entry.failure_count == 3
+
+    for _ in range(50):
+        backoff = scheduler.plan_failure(entry)
+    assert backoff == timedelta(days=7)
+
+def test_success_resets_failures():
+    scheduler = ChannelScheduler(None)
+    entry = make_entry(failure_count=4)
+
+    scheduler.plan_success(entry, [])
+
+    assert entry.failure_count == 0
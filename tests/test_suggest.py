@@ -0,0 +1,56 @@
+import asyncio
+from sqlalchemy import text
+from teso.database import Database
+from teso.suggest import SuggestionIndex, extract_ngrams
+
+def test_extract_ngrams_splits_cjk_runs():
+    assert extract_ngrams("中文资源 Movies") == ['movies', '中文', '文资', '资源', '中文资', '文资源']
+
+def test_ngram_candidates_stay_capped():
+    index = SuggestionIndex(max_ngram_candidates=10)
+
+    index._count_ngrams([f"word{i:04d}" for i in range(100)] + ["common common common"])
+
+    assert len(index.ngram_counts) == 10
+    assert index.ngram_counts['common'] == 3
+
+def test_recurring_new_term_survives_pruning():
+    index = SuggestionIndex(min_ngram_count=5, max_ngram_candidates=1000)
+    index._count_ngrams([f"word{i:04d}" for i in range(1000)] * 10)
+
+    for _ in range(20):
+        index._count_ngrams(["trending"] * 3)
+
+    assert len(index.ngram_counts) == 1000
+    assert index.ngram_counts['trending'] - index.ngram_errors['trending'] == 60
+    assert index._build()[1]['trending'] == 60
+
+def test_refresh_builds_suggestions_incrementally(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'teso.db'}")
+    index = SuggestionIndex(min_ngram_count=2, message_batch_size=2)
+
+    async def run():
+        await database.create_all()
+        async with database.write_engine.begin() as conn:
+            await conn.execute(text(
+                "INSERT INTO channels (channel_id, username, title) VALUES (1, 'Aliyun_4K_Movies', 'Movies')"
+            ))
+            for i in range(3):
+                await conn.execute(text(
+                    f"INSERT INTO messages (message_id, channel_id, text) VALUES ({i}, 1, 'moviepass 电影资源')"
+                ))
+        await index.refresh(database.PrimaryReadSession)
+        first = index.suggest('movie')
+
+        async with database.write_engine.begin() as conn:
+            await conn.execute(text(
+                "INSERT INTO messages (message_id, channel_id, text) VALUES (9, 1, 'moviepass')"
+            ))
+        await index.refresh(database.PrimaryReadSession)
+        return first
+
+    first = asyncio.run(run())
+    assert first[0] == 'movies'
+    assert 'moviepass' in first
+    assert index.ngram_counts['moviepass'] == 4
+    assert index.suggest('电') == ['电影', '电影资']